@@ -25,6 +25,10 @@ router = APIRouter()
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 
+# Overridable so load tests can point at a local stand-in (see backend/loadtest/stubs.py)
+GOOGLE_TOKEN_ENDPOINT = os.getenv("GOOGLE_TOKEN_ENDPOINT", "https://oauth2.googleapis.com/token")
+GOOGLE_USERINFO_ENDPOINT = os.getenv("GOOGLE_USERINFO_ENDPOINT", "https://www.googleapis.com/oauth2/v2/userinfo")
+
 # Add this class for request validation
 class GoogleLoginRequest(BaseModel):
     code: str
@@ -52,7 +56,7 @@ async def google_login(request: GoogleLoginRequest, db: Session = Depends(get_db
             )
 
         # Exchange code for tokens
-        token_endpoint = "https://oauth2.googleapis.com/token"
+        token_endpoint = GOOGLE_TOKEN_ENDPOINT
         token_data = {
             "code": request.code,
             "client_id": GOOGLE_CLIENT_ID,
@@ -83,7 +87,7 @@ async def google_login(request: GoogleLoginRequest, db: Session = Depends(get_db
         logger.info("Successfully received tokens")
         
         # Get user info from Google
-        userinfo_endpoint = "https://www.googleapis.com/oauth2/v2/userinfo"
+        userinfo_endpoint = GOOGLE_USERINFO_ENDPOINT
         headers = {"Authorization": f"Bearer {tokens['access_token']}"}
         
         userinfo_response = requests.get(userinfo_endpoint, headers=headers)
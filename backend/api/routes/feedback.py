@@ -1,13 +1,65 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
+from typing import List, Optional
+import json
+import logging
 import math
+import os
 import numpy as np
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-class PoseData(BaseModel):
+# Angle thresholds (degrees) behind every feedback rule. Defaults were tuned by hand in
+# notebooks/thresholds.ipynb; `python -m backend.calibration.calibrate` fits them to labelled
+# recordings and writes a JSON file in this shape, loaded via FEEDBACK_THRESHOLDS.
+DEFAULT_THRESHOLDS = {
+    "squat": {
+        "knee_standing": 150,   # both knees straighter than this: standing, no depth feedback
+        "knee_too_deep": 60,
+        "knee_shallow": 120,
+        "hip_upright": 15,      # torso this close to vertical: no hip feedback
+        "hip_lean": 50,
+        "hip_hinge": 25,
+        "shin_forward": 40,
+        "shin_back": 25,
+    },
+    "plank": {
+        "leg_bent": 150,
+        "hip_misaligned": 150,
+    },
+    "armRaise": {
+        "elbow_bent": 160,
+        "arm_rest": 45,         # both arms below this: at rest, no position feedback
+        "arm_low": 70,
+        "arm_high": 120,
+    },
+}
+
+def load_thresholds(path=None):
+    """Defaults overlaid with the JSON config at `path` (or $FEEDBACK_THRESHOLDS) if there is one"""
+    thresholds = {exercise: dict(values) for exercise, values in DEFAULT_THRESHOLDS.items()}
+    path = path or os.getenv("FEEDBACK_THRESHOLDS")
+    if path:
+        try:
+            with open(path) as f:
+                for exercise, values in json.load(f).items():
+                    thresholds.setdefault(exercise, {}).update(values)
+            logger.info(f"Loaded feedback thresholds from {path}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load feedback thresholds from {path}: {str(e)}")
+    return thresholds
+
+THRESHOLDS = load_thresholds()
+
+class PersonKeypoints(BaseModel):
+    id: int
     keypoints: list
+
+class PoseData(BaseModel):
+    keypoints: list = []
     exerciseType: str
+    people: Optional[List[PersonKeypoints]] = None  # every tracked person, as returned by /pose/estimate
 
 def calculate_angle(A, B, C):
     """
@@ -19,60 +71,191 @@ def calculate_angle(A, B, C):
     c = np.linalg.norm(A - B)
     return math.degrees(math.acos((a**2 + c**2 - b**2) / (2 * a * c)))
 
+def calculate_angles(A, B, C):
+    """
+    Vectorized calculate_angle over (..., 2+) arrays of keypoints; degenerate triangles give NaN.
+    """
+    A, B, C = (np.asarray(P, dtype=np.float64)[..., 0:2] for P in (A, B, C))
+    a = np.linalg.norm(B - C, axis=-1)
+    b = np.linalg.norm(A - C, axis=-1)
+    c = np.linalg.norm(A - B, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos = (a**2 + c**2 - b**2) / (2 * a * c)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+# Keypoints each analysis needs to see (anything at (0, 0) was not detected)
+REQUIRED_KEYPOINTS = {
+    "squat": [11, 13, 15, 12, 14, 16],
+    "plank": [5, 11, 13, 15],
+    "armRaise": [5, 7, 9, 6, 8, 10],
+}
+
+def exercise_angles(exercise_type, keypoints):
+    """
+    The angles each analyze_* function checks, for an (N, 17, 3) batch of poses.
+
+    Returns ({angle name: (N,) degrees}, (N,) mask of poses with every required keypoint visible).
+    """
+    kp = np.asarray(keypoints, dtype=np.float64)
+    if exercise_type == "squat":
+        rhip, rknee, rankle = kp[:, 11], kp[:, 13], kp[:, 15]
+        up = rhip.copy()
+        up[:, 1] -= 100
+        down = rknee.copy()
+        down[:, 1] += 100
+        angles = {
+            "rknee": calculate_angles(rhip, rknee, rankle),
+            "lknee": calculate_angles(kp[:, 12], kp[:, 14], kp[:, 16]),
+            "hip": calculate_angles(kp[:, 6], rhip, up),
+            "shin": calculate_angles(rankle, rknee, down),
+        }
+    elif exercise_type == "plank":
+        angles = {
+            "leg": calculate_angles(kp[:, 11], kp[:, 13], kp[:, 15]),
+            "hip": calculate_angles(kp[:, 5], kp[:, 11], kp[:, 13]),
+        }
+    elif exercise_type == "armRaise":
+        angles = {
+            "relbow": calculate_angles(kp[:, 5], kp[:, 7], kp[:, 9]),
+            "lelbow": calculate_angles(kp[:, 6], kp[:, 8], kp[:, 10]),
+            "rarm": calculate_angles(kp[:, 7], kp[:, 5], kp[:, 11]),
+            "larm": calculate_angles(kp[:, 8], kp[:, 6], kp[:, 12]),
+        }
+    else:
+        raise ValueError(f"Unknown exercise type: {exercise_type}")
+
+    visible = np.any(kp[:, REQUIRED_KEYPOINTS[exercise_type], 0:2] != 0, axis=-1).all(axis=-1)
+    finite = np.all([np.isfinite(v) for v in angles.values()], axis=0)
+    return angles, visible & finite
+
+def detect_faults(exercise_type, angles, thresholds=None):
+    """
+    Vectorized form of the analyze_* rule chains: {fault name: (N,) bool} for a batch of angles.
+    Fault names match the threshold that triggers them; the no-feedback gates (knee_standing,
+    hip_upright, arm_rest) are included under their threshold names too.
+    """
+    t = (thresholds or THRESHOLDS)[exercise_type]
+    if exercise_type == "squat":
+        r, l = angles["rknee"], angles["lknee"]
+        standing = (r > t["knee_standing"]) & (l > t["knee_standing"])
+        too_deep = ~standing & ((r < t["knee_too_deep"]) | (l < t["knee_too_deep"]))
+        shallow = ~standing & ~too_deep & ((r > t["knee_shallow"]) | (l > t["knee_shallow"]))
+        hip = angles["hip"]
+        upright = hip < t["hip_upright"]
+        lean = ~upright & (hip > t["hip_lean"])
+        hinge = ~upright & ~lean & (hip < t["hip_hinge"])
+        shin = angles["shin"]
+        forward = shin > t["shin_forward"]
+        back = ~forward & (shin < t["shin_back"])
+        return {"knee_standing": standing, "knee_too_deep": too_deep, "knee_shallow": shallow,
+                "hip_upright": upright, "hip_lean": lean, "hip_hinge": hinge,
+                "shin_forward": forward, "shin_back": back}
+    if exercise_type == "plank":
+        return {"leg_bent": angles["leg"] < t["leg_bent"],
+                "hip_misaligned": angles["hip"] < t["hip_misaligned"]}
+    if exercise_type == "armRaise":
+        re, le, ra, la = angles["relbow"], angles["lelbow"], angles["rarm"], angles["larm"]
+        rest = (ra < t["arm_rest"]) & (la < t["arm_rest"])
+        low = ~rest & ((ra < t["arm_low"]) | (la < t["arm_low"]))
+        high = ~rest & ~low & ((ra > t["arm_high"]) | (la > t["arm_high"]))
+        return {"elbow_bent": (re < t["elbow_bent"]) | (le < t["elbow_bent"]),
+                "arm_rest": rest, "arm_low": low, "arm_high": high}
+    raise ValueError(f"Unknown exercise type: {exercise_type}")
+
+# Per exercise, the feedback rules in the order their messages appear. Each rule is
+# (gate that silences it, [(fault, message), ...] in priority order, message when nothing fires).
+FEEDBACK_RULES = {
+    "squat": [
+        ("knee_standing", [
+            ("knee_too_deep", "❌ Try coming up a bit to protect your knees."),
+            ("knee_shallow", "❌ You're doing great! Try bending your knees a bit more for better form."),
+        ], "✅ Perfect squat depth! Keep it up! 💪"),
+        ("hip_upright", [
+            ("hip_lean", "❌ Try lifting your chest while keeping your core tight"),
+            ("hip_hinge", "❌ Nice core engagement! Try hinging at your hips a bit more"),
+        ], "✅ Excellent back position! 👍"),
+        (None, [
+            ("shin_forward", "❌ Small adjustment needed - try keeping your shins more vertical"),
+            ("shin_back", "❌ Allow your knees to track forward a bit more"),
+        ], "✅ Perfect shin angle - you've got this! ⭐"),
+    ],
+    "plank": [
+        (None, [("leg_bent", "❌ Try to keep your legs in a straight line.")],
+         "✅ Perfect leg alignment! Keep that core tight! 💪"),
+        (None, [("hip_misaligned", "❌ Adjust your hips slightly to maintain a straight line.")],
+         "✅ Great hip position! Excellent control! ⭐"),
+    ],
+    "armRaise": [
+        (None, [("elbow_bent", "❌ You're getting there! Try reaching a bit higher 💪")],
+         "✅ Perfect arm extension! Excellent control! ⭐"),
+        ("arm_rest", [
+            ("arm_low", "❌ Try raising your arms closer to your ears."),
+            ("arm_high", "❌ Try lowering your arms a bit."),
+        ], "✅ Perfect arm positioning! Excellent control! ⭐"),
+    ],
+}
+
+FEEDBACK_PREFIX = {
+    "squat": ["❕ Note: Please position yourself so that your side is facing the camera."],
+}
+
+NOT_VISIBLE_FEEDBACK = {
+    "squat": "Try adjusting your position so I can see your legs better.",
+    "plank": "Try adjusting your position so I can see your full body better.",
+    "armRaise": "Try adjusting your position so I can see your arms better.",
+}
+
+def analyze_people(exercise_type, keypoints, thresholds=None):
+    """
+    Analyze a whole (P, 17, 3) batch of poses at once; returns one feedback list per person.
+
+    People missing a required keypoint, or whose keypoints coincide so an angle is undefined,
+    get the NOT_VISIBLE_FEEDBACK message instead of rule feedback.
+    """
+    keypoints = np.asarray(keypoints, dtype=np.float64).reshape(-1, 17, 3)
+    angles, valid = exercise_angles(exercise_type, keypoints)
+    rules = detect_faults(exercise_type, angles, thresholds)
+    prefix = FEEDBACK_PREFIX.get(exercise_type, [])
+
+    # For each rule group pick, per person, which message applies (None when gated)
+    chosen = []
+    for gate, faults, good in FEEDBACK_RULES[exercise_type]:
+        conditions = [rules[gate]] if gate else []
+        messages = [None] if gate else []
+        for fault, message in faults:
+            conditions.append(rules[fault])
+            messages.append(message)
+        index = np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+        chosen.append(np.array(messages + [good], dtype=object)[index])
+
+    feedback = []
+    for i in range(len(keypoints)):
+        if not valid[i]:
+            feedback.append(prefix + [NOT_VISIBLE_FEEDBACK[exercise_type]])
+        else:
+            feedback.append(prefix + [group[i] for group in chosen if group[i] is not None])
+    return feedback
+
+def person_array(keypoints):
+    """A person's first 17 keypoints as a (17, 3) array, or None if they are malformed"""
+    try:
+        array = np.array(keypoints[:17], dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+    if array.ndim != 2 or array.shape[0] != 17 or array.shape[1] < 3:
+        return None
+    return array[:, 0:3]
+
 def analyze_squat(keypoints):
     """Analyze squat form using keypoints"""
     if not keypoints or len(keypoints) < 17:
         return ["Let's make sure your full body is visible in the camera."]
         
     try:
-        feedback = ["❕ Note: Please position yourself so that your side is facing the camera."]
-        rhip, rknee, rankle = keypoints[11], keypoints[13], keypoints[15]
-        lhip, lknee, lankle = keypoints[12], keypoints[14], keypoints[16]
-        rknee_angle = calculate_angle(rhip, rknee, rankle)
-        lknee_angle = calculate_angle(lhip, lknee, lankle)
-
-
-        if any(keypoint[0:2] == [0, 0] for keypoint in [rhip, rknee, rankle, lhip, lknee, lankle]):
-            feedback.append("Try adjusting your position so I can see your legs better.")
-            return feedback
-
-        # Analyze squat depth - adjusted for proper squat form
-        # Parallel squat is around 90°, quarter squat ~120°, deep squat ~70°
-        if rknee_angle > 150 and lknee_angle > 150:
-            pass
-        elif rknee_angle < 60 or lknee_angle < 60:
-            feedback.append("❌ Try coming up a bit to protect your knees.")
-        elif rknee_angle > 120 or lknee_angle > 120:
-            feedback.append("❌ You're doing great! Try bending your knees a bit more for better form.")
-        else:
-            feedback.append("✅ Perfect squat depth! Keep it up! 💪")
-
-        # check hip angle - adjusted for proper hip hinge
-        # Neutral spine ~45°, excessive forward lean >60°, too upright <30°
-        rshoulder = keypoints[6]
-        hip_angle = calculate_angle(rshoulder, rhip, [rhip[0], rhip[1] - 100, 0])
-        if hip_angle < 15:
-            pass
-        elif hip_angle > 50:
-            feedback.append("❌ Try lifting your chest while keeping your core tight")
-        elif hip_angle < 25:
-            feedback.append("❌ Nice core engagement! Try hinging at your hips a bit more")
-        else:
-            feedback.append("✅ Excellent back position! 👍")
-
-        # Check shin angle - adjusted for proper knee tracking
-        # Vertical shin is ~0°, forward knee travel ~22-25° is typical
-        shin_angle = calculate_angle(rankle, rknee, [rknee[0], rknee[1] + 100, 0])
-        if shin_angle < 10:
-            pass
-        if shin_angle > 40:
-            feedback.append("❌ Small adjustment needed - try keeping your shins more vertical")
-        elif shin_angle < 25:
-            feedback.append("❌ Allow your knees to track forward a bit more")
-        else:
-            feedback.append("✅ Perfect shin angle - you've got this! ⭐")
-
-        return feedback
+        person = person_array(keypoints)
+        if person is None:
+            return ["Let's adjust your position so I can see your form better."]
+        return analyze_people("squat", person[None])[0]
     except Exception as e:
         return ["Let's adjust your position so I can see your form better."]
 
@@ -82,31 +265,10 @@ def analyze_plank(keypoints):
         return ["Let's make sure your full body is visible in the camera."]
         
     try:
-        feedback = []
-        # Get keypoints for body alignment
-        shoulder = keypoints[5]  # right shoulder
-        hip = keypoints[11]      # right hip
-        knee = keypoints[13]     # right knee
-        ankle = keypoints[15]    # right ankle
-        
-        if any(keypoint[0:2] == [0, 0] for keypoint in [shoulder, hip, knee, ankle]):
-            return ["Try adjusting your position so I can see your full body better."]
-
-        # Check body alignment (should be straight line from shoulders to ankles)
-        leg_angle = calculate_angle(hip, knee, ankle)
-        if leg_angle < 150:
-            feedback.append("❌ Try to keep your legs in a straight line.")
-        else:
-            feedback.append("✅ Perfect leg alignment! Keep that core tight! 💪")
-
-        # Check hip position (shouldn't sag or pike)
-        hip_angle = calculate_angle(shoulder, hip, knee)
-        if hip_angle < 150:
-            feedback.append("❌ Adjust your hips slightly to maintain a straight line.")
-        else:
-            feedback.append("✅ Great hip position! Excellent control! ⭐")
-
-        return feedback
+        person = person_array(keypoints)
+        if person is None:
+            return ["Let's adjust your position so I can see your form better."]
+        return analyze_people("plank", person[None])[0]
     except Exception as e:
         return ["Let's adjust your position so I can see your form better."]
 
@@ -115,44 +277,49 @@ def analyze_arm_raise(keypoints):
     if not keypoints or len(keypoints) < 17:
         return ["Let's make sure your full body is visible in the camera."]
     try:
-        feedback = []
-        # Get keypoints for both arms and shoulders
-        rshoulder, relbow, rwrist = keypoints[5], keypoints[7], keypoints[9]
-        lshoulder, lelbow, lwrist = keypoints[6], keypoints[8], keypoints[10]
-        neck = keypoints[0]  # Use neck as reference for shoulder alignment
-        
-        if any(keypoint[0:2] == [0, 0] for keypoint in [rshoulder, relbow, rwrist, lshoulder, lelbow, lwrist]):
-            return ["Try adjusting your position so I can see your arms better."]
-
-        # Check arm extension angles
-        relbow_angle = calculate_angle(rshoulder, relbow, rwrist)
-        lelbow_angle = calculate_angle(lshoulder, lelbow, lwrist)
-        
-        # Full shoulder flexion is ~180°
-        if relbow_angle < 160 or lelbow_angle < 160:
-            feedback.append("❌ You're getting there! Try reaching a bit higher 💪")
-        else:
-            feedback.append("✅ Perfect arm extension! Excellent control! ⭐")
-
-        lhip, rhip = keypoints[12], keypoints[11]
-
-        rarm_angle = calculate_angle(relbow, rshoulder, rhip)
-        larm_angle = calculate_angle(lelbow, lshoulder, lhip)
-        if rarm_angle < 45 and larm_angle < 45:
-            pass
-        elif rarm_angle < 70 or larm_angle < 70:
-            feedback.append("❌ Try raising your arms closer to your ears.")
-        elif rarm_angle > 120 or larm_angle > 120:
-            feedback.append("❌ Try lowering your arms a bit.")
-        else:
-            feedback.append("✅ Perfect arm positioning! Excellent control! ⭐")
-        return feedback
+        person = person_array(keypoints)
+        if person is None:
+            return ["❌ Let's adjust your position so I can see your form better."]
+        return analyze_people("armRaise", person[None])[0]
     except Exception as e:
         return ["❌ Let's adjust your position so I can see your form better."]
 
+def analyze_group(data: PoseData):
+    """Feedback for every person in the frame, analyzed as one batch"""
+    if data.exerciseType not in FEEDBACK_RULES:
+        feedback = [["I'm not familiar with that exercise yet."] for _ in data.people]
+    else:
+        feedback = [["Let's make sure your full body is visible in the camera."] for _ in data.people]
+        # Only people with well-formed keypoints join the batch, so one bad entry cannot fail the rest
+        complete, arrays = [], []
+        for i, person in enumerate(data.people):
+            if len(person.keypoints) < 17:
+                continue
+            array = person_array(person.keypoints)
+            if array is None:
+                feedback[i] = ["Let's adjust your position so I can see your form better."]
+            else:
+                complete.append(i)
+                arrays.append(array)
+        try:
+            batch = np.stack(arrays) if arrays else np.zeros((0, 17, 3))
+            for i, person_feedback in zip(complete, analyze_people(data.exerciseType, batch)):
+                feedback[i] = person_feedback
+        except Exception as e:
+            logger.error(f"Error analyzing group: {str(e)}")
+            for i in complete:
+                feedback[i] = ["Let's adjust your position so I can see your form better."]
+
+    return {
+        "feedback": feedback[0],
+        "people": [{"id": person.id, "feedback": f} for person, f in zip(data.people, feedback)]
+    }
+
 @router.post("/analyze")
 async def analyze_pose(data: PoseData):
-    """Analyze the pose keypoints based on exercise type"""
+    """Analyze the pose keypoints based on exercise type; pass `people` to analyze everyone in the frame"""
+    if data.people:
+        return analyze_group(data)
     if not data.keypoints:
         return {"feedback": ["Let's make sure you're visible in the camera."]}
         
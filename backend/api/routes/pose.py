@@ -1,13 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import logging
 import io
 import os
 import base64
+from typing import Optional
+
+from ...inference.rendering import render_skeletons
+from ...inference.tracking import TrackerRegistry
 
 router = APIRouter()
 
@@ -15,67 +19,55 @@ router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Check if model file exists and download if missing
-model_path = "models/yolo11n-pose.pt"
-if not os.path.exists(model_path):
-    logger.info(f"Model file not found at {model_path}. Downloading...")
-    try:
-        # This will automatically download the model
-        model = YOLO('yolo11n-pose.pt')
-        # Save the model to the specified path
-        os.makedirs(os.path.dirname(model_path), exist_ok=True)
-        model.save(model_path)
-        logger.info(f"Model downloaded and saved to {model_path}")
-    except Exception as e:
-        logger.error(f"Error downloading model: {e}")
-        raise
+# With INFERENCE_SERVER set, frames go to the shared inference server (backend/inference/server.py)
+# instead of every API worker loading its own copy of the model
+INFERENCE_SERVER = os.getenv("INFERENCE_SERVER")
+if INFERENCE_SERVER:
+    from ...inference.client import InferenceClient
+    inference_client = InferenceClient(INFERENCE_SERVER)
+    model = None
 else:
-    model = YOLO(model_path)
-    logger.info("YOLO11n model loaded successfully")
+    from ...inference.model import load_model, keypoints_from_results
+    inference_client = None
+    model = load_model()
 
-def draw_skeleton(frame, results):
-    """Draw the skeleton on the frame"""
+# One tracker per camera stream when running the model locally. Track state then lives in this
+# process only, so stable IDs need a single uvicorn worker or sticky routing by stream_id; with
+# INFERENCE_SERVER set the server tracks every stream in one place instead.
+trackers = TrackerRegistry()
+
+def run_inference(frame, conf=0.8, stream_id=None):
+    """Return the (P, 17, 3) keypoints of everyone detected in the frame and their (P,) track IDs"""
+    if inference_client is not None:
+        if stream_id:
+            return inference_client.track(frame, stream_id, conf=conf)
+        people = inference_client.infer(frame, conf=conf)
+    else:
+        people = keypoints_from_results(model(frame, conf=conf))
+        if stream_id:
+            return people, trackers.update(stream_id, people)
+    # Without a stream every frame is numbered in detection order
+    return people, np.arange(1, len(people) + 1)
+
+def draw_skeleton(frame, people, track_ids=None):
+    """Draw the skeleton of every detected person on the frame"""
     try:
-        for result in results:
-            if result.keypoints is None or len(result.keypoints.data) == 0:
-                logger.warning("No keypoints detected in this frame")
-                continue
-
-            # Draw keypoints
-            keypoints = result.keypoints.data[0].cpu().numpy()
-            
-            for kp in keypoints:
-                x, y, conf = kp
-                if conf > 0.5:  # Only draw keypoints above confidence threshold
-                    cv2.circle(frame, (int(x), int(y)), 4, (0, 255, 0), -1)
-            
-            # Draw skeleton lines
-            skeleton = [[16,14],[14,12],[15,13],[11,13],[11,12],[6,12],[5,11],[5,6],[6,8],[8,10],[5,7],[7,9],
-                        [2,4],[2,0],[0,1],[1,3]]
-            
-            for line in skeleton:
-                try:
-                    pt1 = keypoints[line[0]]
-                    pt2 = keypoints[line[1]]
-                    if pt1[2] > 0.5 and pt2[2] > 0.5:  # Check confidence
-                        cv2.line(frame, 
-                                (int(pt1[0]), int(pt1[1])), 
-                                (int(pt2[0]), int(pt2[1])), 
-                                (0, 255, 0), 2)
-                except IndexError:
-                    logger.warning(f"Invalid keypoint index in skeleton line: {line}")
-                    continue
-                
-        return frame
+        if len(people) == 0:
+            logger.warning("No keypoints detected in this frame")
+        return render_skeletons(frame, people, track_ids)
     except Exception as e:
         logger.error(f"Error in draw_skeleton: {str(e)}")
         # Return original frame if drawing fails
         return frame
 
 @router.post("/estimate")
-async def estimate_pose(file: UploadFile = File(...)):
+async def estimate_pose(file: UploadFile = File(...), stream_id: Optional[str] = Form(None)):
     """
-    Receives a video frame, runs YOLOv8 pose estimation, and returns the annotated frame
+    Receives a video frame, runs YOLOv8 pose estimation, and returns the annotated frame.
+
+    Every detected person is returned under `people`. Pass the same `stream_id` with each frame
+    of a camera stream to get track IDs that stay stable across frames; `keypoints` is then the
+    longest-tracked person rather than whoever the model happened to detect first.
     """
     try:
         # Read and process the image
@@ -83,17 +75,21 @@ async def estimate_pose(file: UploadFile = File(...)):
         nparr = np.frombuffer(contents, np.uint8)
         frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
-        # Run YOLOv8 inference
-        results = model(frame, conf=0.8)
-        
-        # Extract keypoints
+        # Run YOLOv8 inference; remote calls wait on the server, so keep them off the event loop
+        if inference_client is not None:
+            people, track_ids = await run_in_threadpool(run_inference, frame, 0.8, stream_id)
+        else:
+            people, track_ids = run_inference(frame, 0.8, stream_id)
+
+        # Extract keypoints, primary person first
+        order = np.argsort(track_ids, kind="stable")
+        people, track_ids = people[order], track_ids[order]
         keypoints_list = []
-        if len(results) > 0 and results[0].keypoints is not None:
-            keypoints = results[0].keypoints.data[0].cpu().numpy().tolist()
-            keypoints_list = keypoints
+        if len(people) > 0:
+            keypoints_list = people[0].tolist()
 
         # Draw skeleton on frame
-        annotated_frame = draw_skeleton(frame, results)
+        annotated_frame = draw_skeleton(frame, people, track_ids)
 
         # Convert the frame to base64
         _, buffer = cv2.imencode('.jpg', annotated_frame)
@@ -102,8 +98,23 @@ async def estimate_pose(file: UploadFile = File(...)):
         # Return both image and keypoints as JSON
         return JSONResponse({
             "image": img_base64,
-            "keypoints": keypoints_list
+            "keypoints": keypoints_list,
+            "people": [
+                {"id": int(track_id), "keypoints": keypoints.tolist()}
+                for track_id, keypoints in zip(track_ids, people)
+            ]
         })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/inference-stats")
+async def inference_stats():
+    """Queue depth and per-worker utilization of the shared inference server"""
+    if inference_client is None:
+        return {"mode": "local"}
+    try:
+        stats = await run_in_threadpool(inference_client.stats)
+        return {"mode": "server", "address": INFERENCE_SERVER, **stats}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Inference server unavailable: {str(e)}")
@@ -0,0 +1,380 @@
+"""
+Fit the feedback angle thresholds to a labelled corpus of keypoint recordings.
+
+Two streaming passes over the corpus (see corpus.py for the recording format):
+  1. Accumulate fixed-bin histograms of every angle, per exercise and per phase. These give
+     the distribution tables and percentile bands. Per-fault histograms of labelled positive
+     and negative frames give each fault's F1-optimal threshold.
+  2. Re-run the full feedback rule chains with the default and calibrated thresholds.
+     Report precision and recall against the labels.
+
+Memory use depends only on the histogram resolution and --chunk-size, never on corpus size.
+
+Run using (from the repository root):
+    python -m backend.calibration.calibrate recordings/ --output thresholds.json --report report.json
+    FEEDBACK_THRESHOLDS=thresholds.json uvicorn backend.main:app
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import logging
+
+import numpy as np
+
+from ..api.routes.feedback import DEFAULT_THRESHOLDS, detect_faults, exercise_angles
+from .corpus import NO_PHASE, UNLABELLED, find_recordings, iter_chunks
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ALL_PHASES = "all"
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Left and right combined the way the rule chains combine them ("either knee below ..." is the min)
+DERIVED_ANGLES = {
+    "squat": {"knee_min": ("rknee", "lknee", np.minimum), "knee_max": ("rknee", "lknee", np.maximum)},
+    "armRaise": {
+        "elbow_min": ("relbow", "lelbow", np.minimum),
+        "arm_min": ("rarm", "larm", np.minimum),
+        "arm_max": ("rarm", "larm", np.maximum),
+    },
+}
+
+# fault -> (angle it thresholds, direction in which the fault fires)
+FAULT_RULES = {
+    "squat": {
+        "knee_too_deep": ("knee_min", "<"),
+        "knee_shallow": ("knee_max", ">"),
+        "hip_lean": ("hip", ">"),
+        "hip_hinge": ("hip", "<"),
+        "shin_forward": ("shin", ">"),
+        "shin_back": ("shin", "<"),
+    },
+    "plank": {
+        "leg_bent": ("leg", "<"),
+        "hip_misaligned": ("hip", "<"),
+    },
+    "armRaise": {
+        "elbow_bent": ("elbow_min", "<"),
+        "arm_low": ("arm_min", "<"),
+        "arm_high": ("arm_max", ">"),
+    },
+}
+
+# "no feedback" gates, set from the percentile band of the rest phase with --calibrate-gates
+GATE_RULES = {
+    "squat": {"knee_standing": ("knee_min", 5), "hip_upright": ("hip", 95)},
+    "armRaise": {"arm_rest": ("arm_max", 95)},
+}
+
+def all_angles(exercise: str, keypoints: np.ndarray) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    angles, valid = exercise_angles(exercise, keypoints)
+    for name, (right, left, combine) in DERIVED_ANGLES.get(exercise, {}).items():
+        angles[name] = combine(angles[right], angles[left])
+    return angles, valid
+
+class AngleHistogram:
+    """Streaming distribution of angles in [0, 180] degrees: fixed bins plus running moments"""
+
+    def __init__(self, resolution: float = 0.5):
+        self.edges = np.arange(0.0, 180.0 + resolution, resolution)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def add(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        bins = np.clip(np.searchsorted(self.edges, values, side="right") - 1, 0, len(self.counts) - 1)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def percentile(self, q: float) -> float:
+        """Percentile interpolated linearly within the bin it falls in"""
+        n = self.count
+        if n == 0:
+            return float("nan")
+        cumulative = np.cumsum(self.counts)
+        target = q / 100 * n
+        i = int(np.searchsorted(cumulative, target, side="left"))
+        i = min(i, len(self.counts) - 1)
+        before = cumulative[i - 1] if i > 0 else 0
+        fraction = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        value = self.edges[i] + fraction * (self.edges[i + 1] - self.edges[i])
+        return float(np.clip(value, self.min, self.max))
+
+    def summary(self) -> Dict:
+        n = self.count
+        if n == 0:
+            return {"count": 0}
+        mean = self.total / n
+        return {
+            "count": n,
+            "mean": mean,
+            "std": float(np.sqrt(max(self.total_sq / n - mean**2, 0.0))),
+            "min": self.min,
+            "max": self.max,
+            **{f"p{q}": self.percentile(q) for q in PERCENTILES},
+        }
+
+def best_threshold(positive: AngleHistogram, negative: AngleHistogram, direction: str,
+                   default: float) -> Tuple[float, float]:
+    """
+    F1-optimal cut on the bin edges for a rule that fires when angle `direction` threshold.
+    Ties go to the cut closest to the current default. Returns (threshold, F1).
+    """
+    pos, neg = positive.counts, negative.counts
+    # Counts that fire for a cut at each edge
+    if direction == ">":
+        tp = np.concatenate([np.cumsum(pos[::-1])[::-1], [0]])
+        fp = np.concatenate([np.cumsum(neg[::-1])[::-1], [0]])
+    else:
+        tp = np.concatenate([[0], np.cumsum(pos)])
+        fp = np.concatenate([[0], np.cumsum(neg)])
+    fn = pos.sum() - tp
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f1 = np.where(tp > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+
+    best = np.flatnonzero(np.isclose(f1, f1.max()))
+    choice = best[np.argmin(np.abs(positive.edges[best] - default))]
+    return float(positive.edges[choice]), float(f1[choice])
+
+class ConfusionCounts:
+    def __init__(self):
+        self.tp = self.fp = self.fn = self.tn = 0
+
+    def add(self, predicted: np.ndarray, actual: np.ndarray):
+        self.tp += int(np.sum(predicted & actual))
+        self.fp += int(np.sum(predicted & ~actual))
+        self.fn += int(np.sum(~predicted & actual))
+        self.tn += int(np.sum(~predicted & ~actual))
+
+    def summary(self) -> Dict:
+        precision = self.tp / (self.tp + self.fp) if self.tp + self.fp else 0.0
+        recall = self.tp / (self.tp + self.fn) if self.tp + self.fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {"precision": precision, "recall": recall, "f1": f1,
+                "support": self.tp + self.fn, "frames": self.tp + self.fp + self.fn + self.tn}
+
+class Calibrator:
+    def __init__(self, paths: List[str], chunk_size: int = 65536, resolution: float = 0.5,
+                 rest_phase: str = "rest", baseline=None, calibrate_gates: bool = False,
+                 default_exercise: Optional[str] = None):
+        self.paths = paths
+        self.default_exercise = default_exercise
+        self.chunk_size = chunk_size
+        self.resolution = resolution
+        self.rest_phase = rest_phase
+        self.calibrate_gates = calibrate_gates
+        self.baseline = baseline or {exercise: dict(values) for exercise, values in DEFAULT_THRESHOLDS.items()}
+        self.frames = {}
+        self.valid_frames = {}
+        # exercise -> angle -> phase -> histogram
+        self.distributions: Dict[str, Dict[str, Dict[str, AngleHistogram]]] = {}
+        # exercise -> fault -> (positive, negative)
+        self.fault_histograms: Dict[str, Dict[str, Tuple[AngleHistogram, AngleHistogram]]] = {}
+
+    def _histogram(self, exercise: str, angle: str, phase: str) -> AngleHistogram:
+        phases = self.distributions.setdefault(exercise, {}).setdefault(angle, {})
+        if phase not in phases:
+            phases[phase] = AngleHistogram(self.resolution)
+        return phases[phase]
+
+    def collect(self):
+        """Pass 1: angle distributions and labelled fault histograms"""
+        for chunk in iter_chunks(self.paths, self.chunk_size, self.default_exercise):
+            exercise = chunk.exercise
+            if exercise not in FAULT_RULES:
+                logger.warning(f"Skipping {len(chunk)} frames of unknown exercise {exercise}")
+                continue
+            angles, valid = all_angles(exercise, chunk.keypoints)
+            self.frames[exercise] = self.frames.get(exercise, 0) + len(chunk)
+            self.valid_frames[exercise] = self.valid_frames.get(exercise, 0) + int(valid.sum())
+
+            phases = chunk.phases[valid]
+            phase_names = [p for p in np.unique(phases) if p != NO_PHASE]
+            for name, values in angles.items():
+                values = values[valid]
+                self._histogram(exercise, name, ALL_PHASES).add(values)
+                for phase in phase_names:
+                    self._histogram(exercise, name, phase).add(values[phases == phase])
+
+            for fault, (angle, _) in FAULT_RULES[exercise].items():
+                if fault not in chunk.labels:
+                    continue
+                labels = chunk.labels[fault][valid]
+                values = angles[angle][valid]
+                positive, negative = self.fault_histograms.setdefault(exercise, {}).setdefault(
+                    fault, (AngleHistogram(self.resolution), AngleHistogram(self.resolution)))
+                positive.add(values[labels == 1])
+                negative.add(values[labels == 0])
+
+    def fit(self) -> Tuple[Dict, Dict]:
+        """Calibrated thresholds, plus how each one was chosen"""
+        thresholds = {exercise: dict(values) for exercise, values in self.baseline.items()}
+        provenance = {}
+        for exercise, faults in self.fault_histograms.items():
+            for fault, (positive, negative) in faults.items():
+                if positive.count == 0 or negative.count == 0:
+                    continue
+                _, direction = FAULT_RULES[exercise][fault]
+                value, f1 = best_threshold(positive, negative, direction, thresholds[exercise][fault])
+                thresholds[exercise][fault] = round(value, 1)
+                provenance.setdefault(exercise, {})[fault] = {"method": "max_f1", "f1": f1}
+
+        if not self.calibrate_gates:
+            return thresholds, provenance
+        for exercise, gates in GATE_RULES.items():
+            for gate, (angle, q) in gates.items():
+                rest = self.distributions.get(exercise, {}).get(angle, {}).get(self.rest_phase)
+                if rest is None or rest.count == 0:
+                    continue
+                thresholds[exercise][gate] = round(rest.percentile(q), 1)
+                provenance.setdefault(exercise, {})[gate] = {"method": f"p{q} of {angle} in {self.rest_phase}"}
+        return thresholds, provenance
+
+    def evaluate(self, configs: Dict[str, Dict]) -> Dict:
+        """Pass 2: precision/recall of the full rule chains for each threshold config"""
+        counts = {name: {} for name in configs}
+        for chunk in iter_chunks(self.paths, self.chunk_size, self.default_exercise):
+            exercise = chunk.exercise
+            if exercise not in FAULT_RULES or not chunk.labels:
+                continue
+            angles, valid = all_angles(exercise, chunk.keypoints)
+            for name, thresholds in configs.items():
+                predicted = detect_faults(exercise, angles, thresholds)
+                for fault, labels in chunk.labels.items():
+                    if fault not in predicted:
+                        continue
+                    labelled = valid & (labels != UNLABELLED)
+                    counts[name].setdefault(exercise, {}).setdefault(fault, ConfusionCounts()).add(
+                        predicted[fault][labelled], labels[labelled] == 1)
+        return {
+            name: {exercise: {fault: c.summary() for fault, c in faults.items()}
+                   for exercise, faults in by_exercise.items()}
+            for name, by_exercise in counts.items()
+        }
+
+    def report(self, thresholds: Dict, provenance: Dict, evaluation: Dict) -> Dict:
+        return {
+            "recordings": len(self.paths),
+            "exercises": {
+                exercise: {
+                    "frames": self.frames.get(exercise, 0),
+                    "valid_frames": self.valid_frames.get(exercise, 0),
+                    "distributions": {
+                        angle: {phase: h.summary() for phase, h in phases.items()}
+                        for angle, phases in self.distributions.get(exercise, {}).items()
+                    },
+                    "thresholds": {
+                        key: {"baseline": self.baseline[exercise][key], "calibrated": value,
+                              **provenance.get(exercise, {}).get(key, {"method": "unchanged"})}
+                        for key, value in thresholds[exercise].items()
+                    },
+                    "evaluation": {
+                        name: results.get(exercise, {}) for name, results in evaluation.items()
+                    },
+                }
+                for exercise in thresholds if exercise in self.frames
+            },
+        }
+
+def print_report(report: Dict):
+    for exercise, data in report["exercises"].items():
+        print(f"\n=== {exercise}: {data['valid_frames']}/{data['frames']} frames with the required keypoints")
+
+        print(f"\n{'angle':<10} {'phase':<10} {'count':>8} {'mean':>7} {'std':>6} " +
+              " ".join(f"{'p' + str(q):>6}" for q in PERCENTILES))
+        for angle, phases in data["distributions"].items():
+            for phase, s in sorted(phases.items(), key=lambda item: item[0] != ALL_PHASES):
+                if not s["count"]:
+                    continue
+                print(f"{angle:<10} {phase:<10} {s['count']:>8} {s['mean']:>7.1f} {s['std']:>6.1f} " +
+                      " ".join(f"{s['p' + str(q)]:>6.1f}" for q in PERCENTILES))
+
+        print(f"\n{'threshold':<15} {'baseline':>8} {'calibrated':>10}  "
+              f"{'P / R (baseline)':>17}  {'P / R (calibrated)':>19}  {'support':>7}  method")
+        for key, t in data["thresholds"].items():
+            base = data["evaluation"].get("baseline", {}).get(key)
+            cal = data["evaluation"].get("calibrated", {}).get(key)
+            pr = lambda r: f"{r['precision']:.2f} / {r['recall']:.2f}" if r else "-"
+            print(f"{key:<15} {t['baseline']:>8.1f} {t['calibrated']:>10.1f}  {pr(base):>17}  {pr(cal):>19}  "
+                  f"{(cal or {}).get('support', '-'):>7}  {t['method']}")
+
+def read_baseline(path: str) -> Dict[str, Dict[str, float]]:
+    """
+    Defaults overlaid with the threshold JSON at path. Unlike feedback.load_thresholds this never
+    falls back quietly: an unreadable file or an unknown exercise or threshold raises ValueError.
+    """
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"could not read {path}: {str(e)}")
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{path}: expected an object of exercise -> thresholds")
+
+    thresholds = {exercise: dict(values) for exercise, values in DEFAULT_THRESHOLDS.items()}
+    for exercise, values in overrides.items():
+        if exercise not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"{path}: unknown exercise {exercise!r}")
+        if not isinstance(values, dict):
+            raise ValueError(f"{path}: expected an object of thresholds for {exercise}")
+        for key, value in values.items():
+            if key not in DEFAULT_THRESHOLDS[exercise]:
+                raise ValueError(f"{path}: unknown {exercise} threshold {key!r}")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{path}: {exercise}.{key} must be a number, got {value!r}")
+            thresholds[exercise][key] = value
+    return thresholds
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate feedback thresholds from labelled keypoint recordings")
+    parser.add_argument("paths", nargs="+", help=".npz recordings or directories of them")
+    parser.add_argument("--output", default="thresholds.json", help="Where to write the calibrated thresholds")
+    parser.add_argument("--report", help="Write the full distribution and evaluation report as JSON")
+    parser.add_argument("--baseline", help="Threshold JSON to start from and compare against (defaults to feedback.py)")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="Frames processed per batch")
+    parser.add_argument("--resolution", type=float, default=0.5, help="Histogram bin width in degrees")
+    parser.add_argument("--calibrate-gates", action="store_true",
+                        help="Also set the no-feedback gates (e.g. knee_standing) from the rest phase's percentile band")
+    parser.add_argument("--rest-phase", default="rest", help="Phase label used by --calibrate-gates")
+    parser.add_argument("--exercise", choices=sorted(FAULT_RULES),
+                        help="Exercise of recordings that do not store one (otherwise they are skipped)")
+    args = parser.parse_args()
+
+    paths = find_recordings(args.paths)
+    if not paths:
+        parser.error("No .npz recordings found")
+    logger.info(f"Calibrating from {len(paths)} recordings")
+
+    try:
+        baseline = read_baseline(args.baseline) if args.baseline else None
+    except ValueError as e:
+        parser.error(f"--baseline: {str(e)}")
+    calibrator = Calibrator(paths, args.chunk_size, args.resolution, args.rest_phase, baseline, args.calibrate_gates,
+                            args.exercise)
+    calibrator.collect()
+    thresholds, provenance = calibrator.fit()
+    evaluation = calibrator.evaluate({"baseline": calibrator.baseline, "calibrated": thresholds})
+    report = calibrator.report(thresholds, provenance, evaluation)
+
+    print_report(report)
+    with open(args.output, "w") as f:
+        json.dump(thresholds, f, indent=2)
+    logger.info(f"Wrote calibrated thresholds to {args.output}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
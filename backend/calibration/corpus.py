@@ -0,0 +1,117 @@
+"""
+Labelled keypoint recordings used to calibrate the feedback thresholds.
+
+A recording is one `.npz` file per session containing:
+    keypoints      (T, 17, 3) float   YOLO keypoints per frame (x, y, confidence)
+    exercise       ()         str     "squat", "plank" or "armRaise"; if absent, pass --exercise to the calibrator
+    phase          (T,)       str     optional movement phase per frame, e.g. "rest", "descent", "bottom"
+    fault_<name>   (T,)       int     optional per-frame label for a fault in feedback.DEFAULT_THRESHOLDS
+                                      (1 = fault present, 0 = absent, -1 = not labelled)
+
+Frames are streamed in fixed-size chunks per exercise, so memory stays bounded however
+many sessions the corpus holds.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+UNLABELLED = -1
+NO_PHASE = ""
+
+@dataclass
+class Chunk:
+    """A batch of frames from one exercise, possibly spanning several recordings"""
+    exercise: str
+    keypoints: np.ndarray          # (N, 17, 3)
+    phases: np.ndarray             # (N,) str, NO_PHASE where unknown
+    labels: Dict[str, np.ndarray]  # fault -> (N,) int8, UNLABELLED where unknown
+
+    def __len__(self):
+        return len(self.keypoints)
+
+def find_recordings(paths: Iterable[str]) -> List[str]:
+    """Expand files and directories (recursively) into a sorted list of .npz recordings"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, f) for f in files if f.endswith(".npz"))
+        elif path.endswith(".npz"):
+            found.append(path)
+        else:
+            logger.warning(f"Skipping {path}: not an .npz recording or directory")
+    return sorted(found)
+
+def load_recording(path: str, default_exercise: Optional[str] = None) -> Chunk:
+    with np.load(path, allow_pickle=False) as data:
+        keypoints = np.asarray(data["keypoints"], dtype=np.float32)
+        if keypoints.ndim != 3 or keypoints.shape[1:] != (17, 3):
+            raise ValueError(f"{path}: expected keypoints of shape (T, 17, 3), got {keypoints.shape}")
+        frames = len(keypoints)
+
+        exercise = str(data["exercise"]) if "exercise" in data else default_exercise
+        if not exercise:
+            raise ValueError(f"{path}: no exercise recorded and no default given")
+
+        phases = np.asarray(data["phase"]).astype(str) if "phase" in data else np.full(frames, NO_PHASE)
+        labels = {
+            key[len("fault_"):]: np.asarray(data[key]).astype(np.int8)
+            for key in data.files if key.startswith("fault_")
+        }
+
+    for name, values in [("phase", phases), *labels.items()]:
+        if len(values) != frames:
+            raise ValueError(f"{path}: {name} has {len(values)} entries for {frames} frames")
+    return Chunk(exercise, keypoints, phases, labels)
+
+def _concat(parts: List[Chunk]) -> Chunk:
+    faults = set().union(*(part.labels for part in parts))
+    labels = {
+        fault: np.concatenate([
+            part.labels.get(fault, np.full(len(part), UNLABELLED, dtype=np.int8)) for part in parts
+        ])
+        for fault in faults
+    }
+    return Chunk(
+        parts[0].exercise,
+        np.concatenate([part.keypoints for part in parts]),
+        np.concatenate([part.phases for part in parts]),
+        labels,
+    )
+
+def _split(chunk: Chunk, start: int, stop: int) -> Chunk:
+    return Chunk(chunk.exercise, chunk.keypoints[start:stop], chunk.phases[start:stop],
+                 {fault: values[start:stop] for fault, values in chunk.labels.items()})
+
+def iter_chunks(paths: List[str], chunk_size: int = 65536,
+                default_exercise: Optional[str] = None) -> Iterator[Chunk]:
+    """Yield chunks of at most chunk_size frames, one exercise per chunk"""
+    pending: Dict[str, List[Chunk]] = {}
+    sizes: Dict[str, int] = {}
+
+    for path in paths:
+        try:
+            recording = load_recording(path, default_exercise)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Skipping recording {path}: {str(e)}")
+            continue
+
+        start = 0
+        while start < len(recording):
+            exercise = recording.exercise
+            room = chunk_size - sizes.get(exercise, 0)
+            part = _split(recording, start, start + room)
+            start += len(part)
+            pending.setdefault(exercise, []).append(part)
+            sizes[exercise] = sizes.get(exercise, 0) + len(part)
+            if sizes[exercise] >= chunk_size:
+                yield _concat(pending.pop(exercise))
+                sizes[exercise] = 0
+
+    for parts in pending.values():
+        yield _concat(parts)
@@ -0,0 +1,238 @@
+"""
+Client side of the inference server, used by API workers in place of a local YOLO model.
+"""
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from typing import Dict, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .server import get_authkey, parse_address
+from .shm import FrameRing
+
+logger = logging.getLogger(__name__)
+
+class _Pending:
+    __slots__ = ("event", "error", "track_ids", "abandoned")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+        self.track_ids = None
+        self.abandoned = False
+
+class _Session:
+    """
+    One connection to the inference server, with the ring and free-slot pool that belong to it.
+
+    When the connection drops, every pending call is failed and the session is discarded whole,
+    so slots abandoned by timed-out callers are reclaimed along with it.
+    """
+
+    def __init__(self, address: str):
+        self.conn = Client(parse_address(address), authkey=get_authkey())
+        kind, ring_name, layout = self.conn.recv()
+        if kind != "ring":
+            self.conn.close()
+            raise RuntimeError(f"Unexpected handshake from inference server: {kind}")
+        self.ring = FrameRing.attach(ring_name, **layout)
+
+        self.free = queue.Queue()
+        for slot in range(self.ring.slots):
+            self.free.put(slot)
+        self.pending: Dict[int, _Pending] = {}
+        self.stats: Optional[queue.Queue] = None
+        # Guards `pending`, `closed` and `users`, and makes the reader/caller handoff of a slot atomic
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.closed = False
+        # Calls currently touching the ring; it is unmapped once the session is closed and this drops to 0
+        self.users = 0
+        self._ring_closed = False
+
+        threading.Thread(target=self._read_loop, name="inference-client", daemon=True).start()
+
+    def send(self, message):
+        with self.send_lock:
+            self.conn.send(message)
+
+    def _read_loop(self):
+        try:
+            while True:
+                message = self.conn.recv()
+                if message[0] == "done":
+                    _, slot, error, track_ids = message
+                    with self.lock:
+                        pending = self.pending.pop(slot, None)
+                        if pending is None:
+                            continue
+                        if pending.abandoned:
+                            # The caller timed out; the slot is only safe to reuse now
+                            self.free.put(slot)
+                            continue
+                        pending.error = error
+                        pending.track_ids = track_ids
+                        pending.event.set()
+                elif message[0] == "stats" and self.stats is not None:
+                    self.stats.put(message[1])
+        except (EOFError, OSError):
+            if not self.closed:
+                logger.error("Lost connection to inference server")
+        finally:
+            with self.lock:
+                self.closed = True
+                for pending in self.pending.values():
+                    pending.error = "Inference server connection closed"
+                    pending.event.set()
+                self.pending.clear()
+                idle = self.users == 0
+            if self.stats is not None:
+                self.stats.put(None)
+            self.conn.close()
+            if idle:
+                self._close_ring()
+
+    def _close_ring(self):
+        with self.lock:
+            if self._ring_closed:
+                return
+            self._ring_closed = True
+        self.ring.close()
+
+    def infer(self, frame: np.ndarray, conf: float, timeout: float,
+              stream_id: Optional[str] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        with self.lock:
+            if self.closed:
+                raise ConnectionError("Inference server connection closed")
+            self.users += 1
+        try:
+            return self._infer(frame, conf, timeout, stream_id)
+        finally:
+            with self.lock:
+                self.users -= 1
+                idle = self.closed and self.users == 0
+            if idle:
+                self._close_ring()
+
+    def _infer(self, frame: np.ndarray, conf: float, timeout: float,
+               stream_id: Optional[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        try:
+            slot = self.free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No free inference slot; the inference server is saturated")
+
+        release = True
+        try:
+            self.ring.write_frame(slot, frame)
+            pending = _Pending()
+            with self.lock:
+                if self.closed:
+                    raise ConnectionError("Inference server connection closed")
+                self.pending[slot] = pending
+            self.send(("infer", slot, conf, stream_id))
+            if not pending.event.wait(timeout):
+                with self.lock:
+                    # The reader may have claimed the result between the timeout and taking the lock
+                    if self.pending.get(slot) is pending:
+                        pending.abandoned = True
+                        release = False
+                if not release:
+                    raise TimeoutError(f"Inference timed out after {timeout}s")
+            if pending.error:
+                raise RuntimeError(f"Inference failed: {pending.error}")
+            return self.ring.read_keypoints(slot), pending.track_ids
+        finally:
+            if release:
+                self.free.put(slot)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        try:
+            self.send(("close",))
+        except (OSError, EOFError):
+            pass
+        # Wakes the reader, which fails anything pending and unmaps the ring
+        self.conn.close()
+
+class InferenceClient:
+    """
+    Thread-safe handle on the inference server.
+
+    Frames are written into a free slot of the shared FrameRing, the slot index is sent
+    over the control channel, and a reader thread wakes the caller when keypoints are back.
+    If the server restarts, the next call reconnects with a fresh ring, at most once per
+    `retry_interval` seconds.
+    """
+
+    def __init__(self, address: str, timeout: float = 10.0, retry_interval: float = 2.0):
+        self.address = address
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._session: Optional[_Session] = None
+        self._connect_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._last_attempt = -float("inf")
+        self._closed = False
+
+        # The API can start before the inference server; calls connect once it is up
+        try:
+            self._connected()
+        except ConnectionError as e:
+            logger.error(str(e))
+
+    def _connected(self) -> _Session:
+        session = self._session
+        if session is not None and not session.closed:
+            return session
+
+        with self._connect_lock:
+            session = self._session
+            if session is not None and not session.closed:
+                return session
+            if self._closed:
+                raise RuntimeError("Inference client closed")
+            if time.monotonic() - self._last_attempt < self.retry_interval:
+                raise ConnectionError(f"Inference server at {self.address} unavailable")
+
+            self._last_attempt = time.monotonic()
+            try:
+                self._session = _Session(self.address)
+            except (OSError, EOFError, AuthenticationError) as e:
+                raise ConnectionError(f"Could not connect to inference server at {self.address}: {str(e)}")
+            logger.info(f"Connected to inference server at {self.address} ({self._session.ring.slots} slots)")
+            return self._session
+
+    def infer(self, frame: np.ndarray, conf: float = 0.8) -> np.ndarray:
+        """Run pose estimation on a BGR frame and return the (P, 17, 3) keypoints"""
+        return self._connected().infer(frame, conf, self.timeout)[0]
+
+    def track(self, frame: np.ndarray, stream_id: str, conf: float = 0.8) -> Tuple[np.ndarray, np.ndarray]:
+        """Like infer, plus the (P,) track IDs the server keeps for `stream_id` across all API workers"""
+        return self._connected().infer(frame, conf, self.timeout, stream_id)
+
+    def stats(self) -> Dict:
+        """Queue depth and per-worker utilization as reported by the server"""
+        session = self._connected()
+        with self._stats_lock:
+            session.stats = queue.Queue()
+            try:
+                session.send(("stats",))
+                stats = session.stats.get(timeout=self.timeout)
+            finally:
+                session.stats = None
+        if stats is None:
+            raise ConnectionError("Inference server connection closed")
+        return stats
+
+    def close(self):
+        with self._connect_lock:
+            self._closed = True
+            if self._session is not None:
+                self._session.close()
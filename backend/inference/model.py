@@ -0,0 +1,37 @@
+import numpy as np
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Importing this module stays cheap: ultralytics (and with it torch) is only imported by
+# load_model, so the inference server's dispatcher can read MODEL_PATH without paying for it
+MODEL_PATH = "models/yolo11n-pose.pt"
+
+def load_model(model_path: str = MODEL_PATH):
+    """Load the YOLO pose model, downloading it to model_path on first use"""
+    from ultralytics import YOLO
+
+    if not os.path.exists(model_path):
+        logger.info(f"Model file not found at {model_path}. Downloading...")
+        try:
+            # This will automatically download the model
+            model = YOLO('yolo11n-pose.pt')
+            # Save the model to the specified path
+            os.makedirs(os.path.dirname(model_path), exist_ok=True)
+            model.save(model_path)
+            logger.info(f"Model downloaded and saved to {model_path}")
+        except Exception as e:
+            logger.error(f"Error downloading model: {e}")
+            raise
+    else:
+        model = YOLO(model_path)
+        logger.info("YOLO11n model loaded successfully")
+    return model
+
+def keypoints_from_results(results):
+    """Return the (P, 17, 3) keypoints of every detected person in the first result"""
+    if len(results) == 0 or results[0].keypoints is None or len(results[0].keypoints.data) == 0:
+        return np.zeros((0, 17, 3), dtype=np.float32)
+    return results[0].keypoints.data.cpu().numpy().astype(np.float32)
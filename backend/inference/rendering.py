@@ -0,0 +1,117 @@
+"""
+Fast skeleton rendering for annotated frames.
+
+The edge list is a precomputed NumPy index, and confidence masking happens for every person
+and edge at once. All bones and all keypoints in a frame are drawn with one cv2.polylines
+call each. A keypoint is a zero-length segment whose round caps give the same dot as
+cv2.circle. Frames are drawn on in place.
+
+Annotate a recorded video offline (from the repository root):
+    python -m backend.inference.rendering input.mov annotated.mp4 --batch-size 16
+"""
+from typing import Iterable, Iterator, Optional, Tuple
+import argparse
+import logging
+
+import cv2
+import numpy as np
+
+from .tracking import PoseTracker, keypoint_boxes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# COCO keypoint pairs joined by a bone
+SKELETON_EDGES = np.array([[16,14],[14,12],[15,13],[11,13],[11,12],[6,12],[5,11],[5,6],[6,8],[8,10],[5,7],[7,9],
+                           [2,4],[2,0],[0,1],[1,3]], dtype=np.intp)
+
+COLOR = (0, 255, 0)
+CONF_THRESHOLD = 0.5
+LINE_THICKNESS = 2
+KEYPOINT_RADIUS = 4
+
+def render_skeletons(frame: np.ndarray, people: np.ndarray, track_ids: Optional[np.ndarray] = None,
+                     conf_threshold: float = CONF_THRESHOLD, color: Tuple[int, int, int] = COLOR) -> np.ndarray:
+    """Draw every person's (P, 17, 3) keypoints and bones onto frame, in place, and return it"""
+    if len(people) == 0:
+        return frame
+
+    visible = people[..., 2] > conf_threshold                      # (P, 17)
+    points = people[..., 0:2].astype(np.int32)                      # (P, 17, 2), truncated like int()
+
+    # Bones whose both ends are confident, as (K, 2, 2) segments
+    edge_visible = visible[:, SKELETON_EDGES[:, 0]] & visible[:, SKELETON_EDGES[:, 1]]
+    segments = points[:, SKELETON_EDGES][edge_visible]
+    if len(segments):
+        cv2.polylines(frame, segments, False, color, LINE_THICKNESS)
+
+    # Keypoints as zero-length segments, whose round caps make filled dots
+    dots = points[visible]
+    if len(dots):
+        cv2.polylines(frame, np.repeat(dots[:, None], 2, axis=1), False, color, 2 * KEYPOINT_RADIUS)
+
+    # Label each person with their track ID when several share the frame
+    if track_ids is not None and len(people) > 1:
+        for (x1, y1), track_id in zip(keypoint_boxes(people)[:, 0:2], track_ids):
+            cv2.putText(frame, str(int(track_id)), (int(x1), max(int(y1) - 10, 15)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+    return frame
+
+def read_batches(cap, batch_size: int) -> Iterator[list]:
+    batch = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def annotate_frames(frames: Iterable[np.ndarray], people_per_frame: Iterable[np.ndarray],
+                    tracker: Optional[PoseTracker] = None) -> Iterator[np.ndarray]:
+    """Render keypoints onto a stream of frames in place, tracking IDs across them if given a tracker"""
+    for frame, people in zip(frames, people_per_frame):
+        track_ids = tracker.update(people) if tracker is not None else None
+        yield render_skeletons(frame, people, track_ids)
+
+def annotate_video(input_path: str, output_path: str, model=None, batch_size: int = 16, conf: float = 0.8) -> int:
+    """Run pose estimation over a video in batches and write the annotated copy; returns frames written"""
+    from .model import keypoints_from_results, load_model
+
+    model = model or load_model()
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {input_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    tracker = PoseTracker()
+    written = 0
+    try:
+        for batch in read_batches(cap, batch_size):
+            results = model(batch, conf=conf, verbose=False)
+            people = [keypoints_from_results([result]) for result in results]
+            for frame in annotate_frames(batch, people, tracker):
+                out.write(frame)
+                written += 1
+    finally:
+        cap.release()
+        out.release()
+    logger.info(f"Wrote {written} annotated frames to {output_path}")
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate a recorded video with pose skeletons")
+    parser.add_argument("input", help="Video to annotate")
+    parser.add_argument("output", help="Where to write the annotated .mp4")
+    parser.add_argument("--batch-size", type=int, default=16, help="Frames per inference batch")
+    parser.add_argument("--conf", type=float, default=0.8, help="Detection confidence threshold")
+    args = parser.parse_args()
+    annotate_video(args.input, args.output, batch_size=args.batch_size, conf=args.conf)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Dedicated inference server: a pool of model-holding worker processes shared by every API worker.
+
+API workers connect over a small control channel (multiprocessing.connection), get their own
+shared-memory FrameRing, and from then on only exchange slot indices with the server.
+Scaling API workers no longer multiplies model memory, and inference runs on its own cores.
+Frames sent with a stream ID are tracked here too, so track IDs stay stable whichever API
+worker a frame of that stream lands on.
+
+The control channel unpickles what authenticated peers send, so the server and every API
+worker must share a secret INFERENCE_AUTHKEY; there is no default.
+
+Run using (from the repository root):
+    export INFERENCE_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+    python -m backend.inference.server --workers 2 --address 127.0.0.1:8500
+    INFERENCE_SERVER=127.0.0.1:8500 uvicorn backend.main:app --workers 4
+"""
+from multiprocessing.connection import Listener
+from typing import Dict, List, Optional, Tuple
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from .model import MODEL_PATH
+from .shm import FrameRing
+from .tracking import TrackerRegistry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = "127.0.0.1:8500"
+MIN_AUTHKEY_LENGTH = 16
+
+def parse_address(address: str):
+    """'host:port' becomes a TCP address, anything else is treated as a Unix socket path"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+def get_authkey() -> bytes:
+    """The shared secret from INFERENCE_AUTHKEY; anyone holding it can run code on the server"""
+    authkey = os.getenv("INFERENCE_AUTHKEY", "")
+    if len(authkey) < MIN_AUTHKEY_LENGTH:
+        raise RuntimeError(f"Set INFERENCE_AUTHKEY to a secret of at least {MIN_AUTHKEY_LENGTH} characters, "
+                           "shared by the inference server and the API, e.g. "
+                           "python -c \"import secrets; print(secrets.token_hex(32))\"")
+    return authkey.encode()
+
+def _worker_main(index: int, model_path: str, jobs, results):
+    """Model-holding worker: loads YOLO once, then serves (ring, slot) jobs until told to stop"""
+    from .model import load_model, keypoints_from_results
+
+    model = load_model(model_path)
+    rings: Dict[str, FrameRing] = {}
+    results.put(("ready", index, os.getpid()))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+
+        kind, conn_id, ring_name = job[:3]
+        if kind == "release":
+            ring = rings.pop(ring_name, None)
+            if ring is not None:
+                ring.close()
+            continue
+
+        _, _, _, layout, slot, conf, job_id = job
+        start = time.perf_counter()
+        error = None
+        try:
+            ring = rings.get(ring_name)
+            if ring is None:
+                # Spawned workers share the server's resource tracker, which owns the ring
+                ring = rings[ring_name] = FrameRing.attach(ring_name, **layout, untrack=False)
+            frame = ring.read_frame(slot)
+            ring.write_keypoints(slot, keypoints_from_results(model(frame, conf=conf, verbose=False)))
+        except Exception as e:
+            logger.error(f"Inference worker {index} failed on slot {slot}: {str(e)}")
+            error = str(e)
+        results.put(("done", index, job_id, time.perf_counter() - start, error))
+
+    for ring in rings.values():
+        ring.close()
+
+class WorkerStats:
+    """Bookkeeping the server keeps for each model worker"""
+
+    def __init__(self, process, jobs):
+        self.process = process
+        self.jobs = jobs
+        self.ready = False
+        # job_id -> (conn_id, slot, stream_id) for every job queued on or running in this worker
+        self.outstanding: Dict[int, Tuple[int, int, Optional[str]]] = {}
+        self.completed = 0
+        self.errors = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self.outstanding)
+
+    def as_dict(self, uptime: float) -> Dict:
+        return {
+            "pid": self.process.pid,
+            "alive": self.process.is_alive(),
+            "ready": self.ready,
+            "queue_depth": self.queued,
+            "completed": self.completed,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "utilization": round(self.busy_seconds / uptime, 4) if uptime > 0 else 0.0,
+        }
+
+class InferenceServer:
+    """Accepts API worker connections and dispatches their frames to the least loaded model worker"""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, workers: int = 2, model_path: str = None,
+                 slots: int = 8, max_width: int = 1920, max_height: int = 1080, max_people: int = 16):
+        self.address = parse_address(address)
+        self.model_path = model_path or MODEL_PATH
+        self.ring_layout = {"slots": slots, "max_frame_bytes": max_width * max_height * 3, "max_people": max_people}
+
+        # spawn keeps torch state and server threads out of the workers
+        self._ctx = multiprocessing.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._num_workers = workers
+        self._workers: List[WorkerStats] = []
+        self._connections = {}
+        self._trackers = TrackerRegistry()
+        self._conn_ids = itertools.count()
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._started = time.time()
+
+    def _spawn_worker(self, index: int) -> WorkerStats:
+        jobs = self._ctx.Queue()
+        process = self._ctx.Process(target=_worker_main, args=(index, self.model_path, jobs, self._results),
+                                    name=f"inference-worker-{index}", daemon=True)
+        process.start()
+        return WorkerStats(process, jobs)
+
+    def start_workers(self, monitor_interval: float = 1.0):
+        self._workers = [self._spawn_worker(index) for index in range(self._num_workers)]
+        threading.Thread(target=self._collect_results, name="inference-results", daemon=True).start()
+        threading.Thread(target=self._monitor_workers, args=(monitor_interval,), name="inference-monitor",
+                         daemon=True).start()
+
+    def _monitor_workers(self, interval: float):
+        """Respawn workers that died (e.g. OOM-killed) and fail the jobs they took down with them"""
+        while not self._stopping.wait(interval):
+            for index in range(len(self._workers)):
+                if not self._workers[index].process.is_alive() and not self._stopping.is_set():
+                    self._restart_worker(index)
+
+    def _restart_worker(self, index: int):
+        replacement = self._spawn_worker(index)
+        with self._lock:
+            dead = self._workers[index]
+            replacement.completed, replacement.busy_seconds = dead.completed, dead.busy_seconds
+            replacement.errors = dead.errors + dead.queued
+            replacement.restarts = dead.restarts + 1
+            self._workers[index] = replacement
+        logger.warning(f"Inference worker {index} exited with code {dead.process.exitcode}; "
+                       f"respawned, failing {dead.queued} outstanding jobs")
+
+        # Jobs still sitting in the dead worker's queue go with it
+        dead.jobs.cancel_join_thread()
+        dead.jobs.close()
+        error = f"Inference worker {index} died"
+        for conn_id, slot, _ in dead.outstanding.values():
+            self._send_done(conn_id, slot, error)
+
+    def stats(self) -> Dict:
+        uptime = time.time() - self._started
+        with self._lock:
+            workers = [worker.as_dict(uptime) for worker in self._workers]
+            connections = len(self._connections)
+        return {
+            "uptime_seconds": round(uptime, 1),
+            "connections": connections,
+            "queue_depth": sum(worker["queue_depth"] for worker in workers),
+            "workers": workers,
+        }
+
+    def _pick_worker(self) -> Optional[int]:
+        """Least loaded live worker, preferring ones that have finished loading the model"""
+        alive = [i for i, w in enumerate(self._workers) if w.process.is_alive()]
+        candidates = [i for i in alive if self._workers[i].ready] or alive
+        if not candidates:
+            return None
+        return min(candidates, key=lambda i: self._workers[i].queued)
+
+    def _send_done(self, conn_id: int, slot: int, error: Optional[str], track_ids=None):
+        with self._lock:
+            entry = self._connections.get(conn_id)
+        if entry is None:
+            return
+        conn, send_lock, _ = entry
+        try:
+            with send_lock:
+                conn.send(("done", slot, error, track_ids))
+        except (OSError, EOFError):
+            pass
+
+    def _track(self, conn_id: int, slot: int, stream_id: str):
+        """Track IDs for the keypoints a worker just wrote into the connection's ring"""
+        with self._lock:
+            entry = self._connections.get(conn_id)
+            if entry is None:
+                return None
+            people = entry[2].read_keypoints(slot)
+        return self._trackers.update(stream_id, people)
+
+    def _collect_results(self):
+        """Route completions from the worker pool back to the API worker that asked"""
+        while True:
+            message = self._results.get()
+            if message[0] == "ready":
+                _, index, pid = message
+                with self._lock:
+                    worker = self._workers[index]
+                    # Ignore a ready from a process that has since been replaced
+                    if worker.process.pid == pid:
+                        worker.ready = True
+                logger.info(f"Inference worker {index} ready (pid {pid})")
+                continue
+
+            _, index, job_id, elapsed, error = message
+            with self._lock:
+                worker = self._workers[index]
+                job = worker.outstanding.pop(job_id, None)
+                if job is None:
+                    # Already failed back to the client when its worker was replaced
+                    continue
+                worker.completed += 1
+                worker.busy_seconds += elapsed
+                if error:
+                    worker.errors += 1
+            conn_id, slot, stream_id = job
+            track_ids = None
+            if stream_id and not error:
+                try:
+                    track_ids = self._track(conn_id, slot, stream_id)
+                except Exception as e:
+                    logger.error(f"Tracking failed for stream {stream_id}: {str(e)}")
+                    error = str(e)
+            self._send_done(conn_id, slot, error, track_ids)
+
+    def _serve_connection(self, conn):
+        conn_id = next(self._conn_ids)
+        ring = FrameRing.create(**self.ring_layout)
+        send_lock = threading.Lock()
+        with self._lock:
+            self._connections[conn_id] = (conn, send_lock, ring)
+        logger.info(f"API worker connected (connection {conn_id}, ring {ring.name})")
+
+        try:
+            with send_lock:
+                conn.send(("ring", ring.name, ring.layout()))
+            while True:
+                message = conn.recv()
+                if message[0] == "infer":
+                    _, slot, conf, stream_id = message
+                    with self._lock:
+                        index = self._pick_worker()
+                        if index is not None:
+                            job_id = next(self._job_ids)
+                            worker = self._workers[index]
+                            worker.outstanding[job_id] = (conn_id, slot, stream_id)
+                            worker.jobs.put(("infer", conn_id, ring.name, ring.layout(), slot, conf, job_id))
+                    if index is None:
+                        self._send_done(conn_id, slot, "No live inference workers")
+                elif message[0] == "stats":
+                    with send_lock:
+                        conn.send(("stats", self.stats()))
+                elif message[0] == "close":
+                    break
+        except (EOFError, OSError):
+            pass
+        finally:
+            # Under the lock so _track never reads a ring being closed
+            with self._lock:
+                self._connections.pop(conn_id, None)
+                # Queued behind any outstanding jobs, so workers detach only once they are done with the ring
+                for worker in self._workers:
+                    worker.jobs.put(("release", conn_id, ring.name))
+                ring.close()
+            conn.close()
+            logger.info(f"API worker disconnected (connection {conn_id})")
+
+    def serve_forever(self, stats_interval: float = 0):
+        authkey = get_authkey()
+        self.start_workers()
+        if stats_interval:
+            threading.Thread(target=self._log_stats, args=(stats_interval,), daemon=True).start()
+
+        with Listener(self.address, authkey=authkey) as listener:
+            logger.info(f"Inference server listening on {self.address} with {len(self._workers)} workers")
+            try:
+                while True:
+                    try:
+                        conn = listener.accept()
+                    except (OSError, EOFError) as e:
+                        logger.warning(f"Rejected connection: {str(e)}")
+                        continue
+                    threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+            except KeyboardInterrupt:
+                logger.info("Shutting down inference server")
+            finally:
+                self._stopping.set()
+                for worker in self._workers:
+                    worker.jobs.put(None)
+                for worker in self._workers:
+                    worker.process.join(timeout=10)
+
+    def _log_stats(self, interval: float):
+        while True:
+            time.sleep(interval)
+            stats = self.stats()
+            logger.info(f"queue_depth={stats['queue_depth']} connections={stats['connections']} " + " ".join(
+                f"w{i}[q={w['queue_depth']} util={w['utilization']:.0%}]" for i, w in enumerate(stats["workers"])
+            ))
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared pose inference server for the Stride API")
+    parser.add_argument("--address", default=os.getenv("INFERENCE_SERVER", DEFAULT_ADDRESS),
+                        help="host:port or a Unix socket path")
+    parser.add_argument("--workers", type=int, default=2, help="Model-holding worker processes")
+    parser.add_argument("--model-path", default=None)
+    parser.add_argument("--slots", type=int, default=8, help="In-flight frames per API worker")
+    parser.add_argument("--max-width", type=int, default=1920)
+    parser.add_argument("--max-height", type=int, default=1080)
+    parser.add_argument("--max-people", type=int, default=16)
+    parser.add_argument("--stats-interval", type=float, default=30.0, help="Seconds between stats log lines, 0 to disable")
+    args = parser.parse_args()
+
+    server = InferenceServer(args.address, args.workers, args.model_path, args.slots,
+                             args.max_width, args.max_height, args.max_people)
+    server.serve_forever(args.stats_interval)
+
+if __name__ == "__main__":
+    main()
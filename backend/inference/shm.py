@@ -0,0 +1,106 @@
+"""
+Shared-memory ring of frame/keypoint slots used between an API worker and the inference server.
+
+Each slot holds one decoded BGR frame going in and up to `max_people` (17, 3) keypoint
+arrays coming back, so frames never cross a socket. Only slot indices travel over the
+control channel.
+"""
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict
+import numpy as np
+
+NUM_KEYPOINTS = 17
+
+# Per-slot header columns
+HEIGHT, WIDTH, PEOPLE = 0, 1, 2
+HEADER_FIELDS = 4
+
+def attach_shared_memory(name: str, untrack: bool = True) -> shared_memory.SharedMemory:
+    """
+    Attach to an existing block. With untrack, this process's resource tracker will not unlink it on exit;
+    pass untrack=False from processes that share the creator's tracker, which already owns the block.
+    """
+    if not untrack:
+        return shared_memory.SharedMemory(name=name)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+class FrameRing:
+    """Fixed-size slots of (header, keypoints, frame) laid out over one shared memory block"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, max_frame_bytes: int,
+                 max_people: int, owner: bool = False):
+        self.shm = shm
+        self.slots = slots
+        self.max_frame_bytes = max_frame_bytes
+        self.max_people = max_people
+        self.owner = owner
+
+        offset = 0
+        self.headers = np.ndarray((slots, HEADER_FIELDS), dtype=np.int32, buffer=shm.buf, offset=offset)
+        offset += self.headers.nbytes
+        self.keypoints = np.ndarray((slots, max_people, NUM_KEYPOINTS, 3), dtype=np.float32,
+                                    buffer=shm.buf, offset=offset)
+        offset += self.keypoints.nbytes
+        self.frames = np.ndarray((slots, max_frame_bytes), dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+    @staticmethod
+    def size(slots: int, max_frame_bytes: int, max_people: int) -> int:
+        return slots * (HEADER_FIELDS * 4 + max_people * NUM_KEYPOINTS * 3 * 4 + max_frame_bytes)
+
+    @classmethod
+    def create(cls, slots: int, max_frame_bytes: int, max_people: int) -> "FrameRing":
+        shm = shared_memory.SharedMemory(create=True, size=cls.size(slots, max_frame_bytes, max_people))
+        return cls(shm, slots, max_frame_bytes, max_people, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, slots: int, max_frame_bytes: int, max_people: int,
+               untrack: bool = True) -> "FrameRing":
+        return cls(attach_shared_memory(name, untrack), slots, max_frame_bytes, max_people)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def layout(self) -> Dict[str, int]:
+        """Everything another process needs to attach to this ring"""
+        return {"slots": self.slots, "max_frame_bytes": self.max_frame_bytes, "max_people": self.max_people}
+
+    def write_frame(self, slot: int, frame: np.ndarray):
+        height, width = frame.shape[:2]
+        nbytes = height * width * 3
+        if frame.ndim != 3 or frame.shape[2] != 3:
+            raise ValueError(f"Expected an (H, W, 3) frame, got {frame.shape}")
+        if nbytes > self.max_frame_bytes:
+            raise ValueError(f"Frame of {width}x{height} exceeds the {self.max_frame_bytes} byte slot")
+        self.frames[slot, :nbytes] = frame.reshape(-1)
+        self.headers[slot, HEIGHT] = height
+        self.headers[slot, WIDTH] = width
+        self.headers[slot, PEOPLE] = 0
+
+    def read_frame(self, slot: int) -> np.ndarray:
+        """Zero-copy view of the frame in `slot`; valid until the slot is reused"""
+        height, width = int(self.headers[slot, HEIGHT]), int(self.headers[slot, WIDTH])
+        return self.frames[slot, :height * width * 3].reshape(height, width, 3)
+
+    def write_keypoints(self, slot: int, keypoints: np.ndarray):
+        people = min(len(keypoints), self.max_people)
+        if people:
+            self.keypoints[slot, :people] = keypoints[:people]
+        self.headers[slot, PEOPLE] = people
+
+    def read_keypoints(self, slot: int) -> np.ndarray:
+        """Copy of the (P, 17, 3) keypoints written for `slot`"""
+        people = int(self.headers[slot, PEOPLE])
+        return self.keypoints[slot, :people].copy()
+
+    def close(self):
+        # Drop the numpy views first, otherwise the mmap cannot be closed
+        del self.headers, self.keypoints, self.frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,99 @@
+"""
+Stable per-person track IDs for multi-person pose streams.
+
+Each camera stream gets its own PoseTracker. Detections are matched to the previous
+frame's people by bounding-box IoU (Hungarian assignment), so one patient keeps the
+same ID while others walk in and out of frame.
+"""
+from typing import Dict
+import threading
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+def keypoint_boxes(people: np.ndarray, min_conf: float = 0.3) -> np.ndarray:
+    """(P, 4) x1, y1, x2, y2 boxes around each person's confident keypoints"""
+    if len(people) == 0:
+        return np.zeros((0, 4))
+    visible = (people[..., 2] > min_conf) & np.any(people[..., 0:2] != 0, axis=-1)
+    # People with no confident keypoints fall back to every detected keypoint
+    visible |= ~visible.any(axis=1, keepdims=True)
+    x = np.where(visible, people[..., 0], np.nan)
+    y = np.where(visible, people[..., 1], np.nan)
+    with np.errstate(invalid="ignore"):
+        return np.stack([np.nanmin(x, 1), np.nanmin(y, 1), np.nanmax(x, 1), np.nanmax(y, 1)], axis=1)
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(len(a), len(b)) IoU matrix"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iou = inter / (area_a[:, None] + area_b[None, :] - inter)
+    return np.nan_to_num(iou)
+
+class PoseTracker:
+    """Assigns stable IDs to the people in consecutive frames of one stream"""
+
+    def __init__(self, min_iou: float = 0.2, max_missed: int = 15):
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4))
+        self.missed = np.zeros(0, dtype=np.int64)
+        self.next_id = 1
+        self.last_seen = time.time()
+
+    def update(self, people: np.ndarray) -> np.ndarray:
+        """Return the (P,) track IDs for this frame's (P, 17, 3) detections"""
+        self.last_seen = time.time()
+        boxes = keypoint_boxes(people)
+        ids = np.full(len(people), -1, dtype=np.int64)
+        matched_tracks = np.zeros(len(self.ids), dtype=bool)
+
+        if len(self.ids) and len(people):
+            iou = box_iou(boxes, self.boxes)
+            rows, cols = linear_sum_assignment(-iou)
+            keep = iou[rows, cols] >= self.min_iou
+            rows, cols = rows[keep], cols[keep]
+            ids[rows] = self.ids[cols]
+            self.boxes[cols] = boxes[rows]
+            matched_tracks[cols] = True
+
+        # Age unmatched tracks and forget the ones gone too long
+        self.missed = np.where(matched_tracks, 0, self.missed + 1)
+        alive = self.missed <= self.max_missed
+        self.ids, self.boxes, self.missed = self.ids[alive], self.boxes[alive], self.missed[alive]
+
+        new = ids == -1
+        if new.any():
+            ids[new] = np.arange(self.next_id, self.next_id + new.sum())
+            self.next_id += int(new.sum())
+            self.ids = np.concatenate([self.ids, ids[new]])
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.missed = np.concatenate([self.missed, np.zeros(new.sum(), dtype=np.int64)])
+        return ids
+
+class TrackerRegistry:
+    """PoseTrackers keyed by stream ID, dropped after `ttl` seconds without frames"""
+
+    def __init__(self, ttl: float = 60.0, **tracker_options):
+        self.ttl = ttl
+        self.tracker_options = tracker_options
+        self._trackers: Dict[str, PoseTracker] = {}
+        self._lock = threading.Lock()
+
+    def update(self, stream_id: str, people: np.ndarray) -> np.ndarray:
+        with self._lock:
+            now = time.time()
+            for key in [k for k, t in self._trackers.items() if now - t.last_seen > self.ttl]:
+                del self._trackers[key]
+            tracker = self._trackers.get(stream_id)
+            if tracker is None:
+                tracker = self._trackers[stream_id] = PoseTracker(**self.tracker_options)
+            return tracker.update(people)
@@ -0,0 +1,203 @@
+"""
+Simulated webcam patient that drives the API the same way web_app/app/exercise/page.tsx does:
+one frame in flight at a time to /pose/estimate, feedback every ANALYZE_INTERVAL,
+an occasional chat message, and a session summary at the end.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+
+import cv2
+import httpx
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Matches ANALYZE_INTERVAL in the exercise page
+ANALYZE_INTERVAL = 1.5
+
+# A side-on standing pose in YOLO keypoint order, used when the pose model finds nobody
+# (e.g. synthetic frames) so /feedback/analyze still runs its full angle analysis
+SYNTHETIC_KEYPOINTS = [
+    [320, 80, 0.9], [330, 72, 0.9], [310, 72, 0.9], [340, 78, 0.9], [300, 78, 0.9],
+    [360, 140, 0.9], [280, 140, 0.9], [375, 210, 0.9], [265, 210, 0.9], [380, 275, 0.9],
+    [260, 275, 0.9], [345, 280, 0.9], [295, 280, 0.9], [350, 380, 0.9], [290, 380, 0.9],
+    [352, 470, 0.9], [288, 470, 0.9]
+]
+
+CHAT_PROMPTS = [
+    "My knees feel sore after squats, what should I change?",
+    "Can you suggest an easier version of the plank?",
+    "How many arm raises should I do per set?"
+]
+
+def load_video_frames(video_path: str, max_frames: int = 300, width: int = 640) -> List[bytes]:
+    """Decode a clip once and pre-encode it as JPEGs so clients spend no CPU on capture"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+
+    frames = []
+    try:
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame.shape[1] != width:
+                height = int(frame.shape[0] * width / frame.shape[1])
+                frame = cv2.resize(frame, (width, height))
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            frames.append(buffer.tobytes())
+    finally:
+        cap.release()
+
+    if not frames:
+        raise ValueError(f"No frames decoded from {video_path}")
+    return frames
+
+def synthetic_frames(count: int = 30, width: int = 640, height: int = 480) -> List[bytes]:
+    """Generate JPEG frames of a moving stick figure over sensor-like noise"""
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = rng.integers(90, 140, size=(height, width, 3), dtype=np.uint8)
+        # Bob the figure up and down like a squat
+        offset = int(40 * np.sin(2 * np.pi * i / count))
+        points = [(int(x), int(y) + offset) for x, y, _ in SYNTHETIC_KEYPOINTS]
+        for a, b in [[16,14],[14,12],[15,13],[11,13],[11,12],[6,12],[5,11],[5,6],[6,8],[8,10],[5,7],[7,9]]:
+            cv2.line(frame, points[a], points[b], (40, 40, 40), 12)
+        cv2.circle(frame, points[0], 28, (40, 40, 40), -1)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        frames.append(buffer.tobytes())
+    return frames
+
+@dataclass
+class PatientStats:
+    """Everything one simulated patient observed during a run"""
+    patient_id: str
+    frames_sent: int = 0
+    frames_dropped: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+
+    def record(self, endpoint: str, seconds: float):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+
+    @property
+    def achieved_fps(self) -> float:
+        return self.frames_sent / self.elapsed if self.elapsed > 0 else 0.0
+
+class SimulatedPatient:
+    """One webcam client streaming frames at a target fps"""
+
+    def __init__(self, patient_id: str, base_url: str, frames: List[bytes], target_fps: float,
+                 exercise_type: str = "squat", chat_interval: Optional[float] = 30.0,
+                 timeout: float = 30.0):
+        self.patient_id = patient_id
+        self.base_url = base_url.rstrip("/")
+        self.frames = frames
+        self.target_fps = target_fps
+        self.exercise_type = exercise_type
+        self.chat_interval = chat_interval
+        self.timeout = timeout
+        self.email = f"{patient_id}@loadtest.local"
+        self.stats = PatientStats(patient_id=patient_id)
+        self.session_feedback = set()
+        self.chat_history = []
+
+    async def _timed(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            self.stats.errors += 1
+            logger.debug(f"{self.patient_id} {endpoint} failed: {str(e)}")
+            return None
+        finally:
+            self.stats.record(endpoint, time.perf_counter() - start)
+
+    async def login(self, client: httpx.AsyncClient):
+        """Log in through the stubbed Google flow so the user row exists for /exercise/session"""
+        await self._timed(client, "auth", "POST", f"{self.base_url}/api/auth/google-login",
+                          json={"code": self.patient_id, "redirect_uri": "http://localhost:3000"})
+
+    async def chat(self, client: httpx.AsyncClient):
+        prompt = CHAT_PROMPTS[len(self.chat_history) % len(CHAT_PROMPTS)]
+        self.chat_history.append({"role": "user", "content": prompt})
+        response = await self._timed(client, "chat", "POST", f"{self.base_url}/api/chat",
+                                     json={"messages": self.chat_history})
+        if response is not None:
+            self.chat_history.append({"role": "assistant", "content": response.json().get("message", "")})
+
+    async def chat_loop(self, client: httpx.AsyncClient, duration: float):
+        """Chat alongside the exercise stream, as a patient with the chat page open would"""
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() + self.chat_interval < deadline:
+            await asyncio.sleep(self.chat_interval)
+            await self.chat(client)
+
+    async def save_session(self, client: httpx.AsyncClient):
+        feedback = sorted(self.session_feedback) or ["No feedback recorded"]
+        await self._timed(client, "session", "POST", f"{self.base_url}/exercise/session",
+                          json={"exerciseType": self.exercise_type, "feedback": feedback, "userEmail": self.email})
+
+    async def stream(self, client: httpx.AsyncClient, duration: float):
+        """
+        Send frames on a fixed fps schedule with one request in flight, like the browser loop.
+        Schedule slots that pass while a request is still outstanding count as dropped frames.
+        """
+        interval = 1.0 / self.target_fps
+        start = time.perf_counter()
+        deadline = start + duration
+        last_analyze = 0.0
+        slot = 0
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+
+            # Wait for the next capture slot, then drop any slots already missed
+            slot_time = start + slot * interval
+            if slot_time > now:
+                await asyncio.sleep(slot_time - now)
+            else:
+                missed = int((now - slot_time) / interval)
+                self.stats.frames_dropped += missed
+                slot += missed
+
+            frame = self.frames[slot % len(self.frames)]
+            slot += 1
+
+            response = await self._timed(client, "pose", "POST", f"{self.base_url}/pose/estimate",
+                                         files={"file": ("frame.jpg", frame, "image/jpeg")},
+                                         data={"stream_id": self.patient_id})
+            if response is None:
+                continue
+            self.stats.frames_sent += 1
+
+            now = time.perf_counter()
+            if now - last_analyze >= ANALYZE_INTERVAL:
+                keypoints = response.json().get("keypoints") or SYNTHETIC_KEYPOINTS
+                feedback_response = await self._timed(client, "feedback", "POST", f"{self.base_url}/feedback/analyze",
+                                                      json={"keypoints": keypoints, "exerciseType": self.exercise_type})
+                if feedback_response is not None:
+                    self.session_feedback.update(feedback_response.json().get("feedback", []))
+                last_analyze = now
+
+        self.stats.elapsed = time.perf_counter() - start
+
+    async def run(self, duration: float) -> PatientStats:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            await self.login(client)
+            tasks = [self.stream(client, duration)]
+            if self.chat_interval:
+                tasks.append(self.chat_loop(client, duration))
+            await asyncio.gather(*tasks)
+            await self.save_session(client)
+        return self.stats
@@ -0,0 +1,70 @@
+"""
+Local stand-ins for the external services the API talks to, so load tests
+never hit OpenAI or Google.
+
+Point the backend at this app with:
+    OPENAI_BASE_URL / OPENAI_API_BASE = http://<host>:<port>/v1
+    GOOGLE_TOKEN_ENDPOINT            = http://<host>:<port>/google/token
+    GOOGLE_USERINFO_ENDPOINT         = http://<host>:<port>/google/userinfo
+
+Run using: uvicorn backend.loadtest.stubs:app --port 8100
+"""
+from fastapi import FastAPI, Form, Header, HTTPException
+import asyncio
+import os
+import time
+import uuid
+
+# Simulated upstream latency, so the API's threadpool sees realistic blocking calls
+OPENAI_LATENCY_MS = float(os.getenv("STUB_OPENAI_LATENCY_MS", "400"))
+GOOGLE_LATENCY_MS = float(os.getenv("STUB_GOOGLE_LATENCY_MS", "50"))
+
+app = FastAPI()
+
+@app.post("/v1/chat/completions")
+async def chat_completions(body: dict):
+    """Mimic the OpenAI chat completions response shape"""
+    await asyncio.sleep(OPENAI_LATENCY_MS / 1000)
+    content = "Great work! Keep your core tight and move slowly through each rep."
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-3.5-turbo"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(content.split()),
+            "total_tokens": prompt_tokens + len(content.split())
+        }
+    }
+
+@app.post("/google/token")
+async def google_token(code: str = Form(...)):
+    """Exchange an authorization code for tokens; the code doubles as the access token"""
+    await asyncio.sleep(GOOGLE_LATENCY_MS / 1000)
+    return {
+        "access_token": code,
+        "expires_in": 3599,
+        "token_type": "Bearer",
+        "id_token": code
+    }
+
+@app.get("/google/userinfo")
+async def google_userinfo(authorization: str = Header(...)):
+    """Return a deterministic user derived from the bearer token"""
+    await asyncio.sleep(GOOGLE_LATENCY_MS / 1000)
+    token = authorization.removeprefix("Bearer ").strip()
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing access token")
+    return {
+        "id": token,
+        "email": f"{token}@loadtest.local",
+        "name": f"Load Test {token}",
+        "picture": None
+    }
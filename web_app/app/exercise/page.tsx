@@ -24,6 +24,7 @@ export default function Exercise() {
   const videoRef = useRef<HTMLVideoElement>(null)
   const streamRef = useRef<MediaStream | null>(null)
   const animationFrameRef = useRef<number>()
+  const streamIdRef = useRef<string>("")
   const { user } = useAuth()
   const router = useRouter()
   const [expandedFeedback, setExpandedFeedback] = useExpandState<Record<string, boolean>>({})
@@ -51,6 +52,7 @@ export default function Exercise() {
           }
         });
         
+        streamIdRef.current = crypto.randomUUID(); // Keeps pose track IDs stable for this session
         setIsExercising(true);
         setSessionFeedback(new Set()); // Clear feedback when starting new session
       }
@@ -82,6 +84,7 @@ export default function Exercise() {
 
         const formData = new FormData();
         formData.append('file', blob);
+        formData.append('stream_id', streamIdRef.current);
 
         const poseResponse = await fetch('http://localhost:8000/pose/estimate', {
           method: 'POST',